@@ -1,4 +1,6 @@
 from node import Node
+from nodeServer import NodeServer
+import asyncio
 import config
 
 
@@ -7,24 +9,28 @@ class MaekawaMutex(object):
     Initializes and runs a Maekawa mutual exclusion algorithm.
 
     Attributes:
+        server (NodeServer): Server handling the incoming messages of all the nodes.
         nodes (list): List of Nodes representing the distributed nodes.
     """
 
     def __init__(self):
-        self.nodes =[Node(i) for i in range(config.numNodes)]
+        self.server = NodeServer()
+        self.nodes =[Node(i, self.server) for i in range(config.numNodes)]
 
 
-    def define_connections(self):
+    async def define_connections(self):
         """Defines the connections between each node and all others."""
         for node in self.nodes:
-            node.do_connections()
+            await node.listen()
+        for node in self.nodes:
+            await node.do_connections()
 
 
-    def run(self):
+    async def run(self):
         """Starts all the nodes and waits for them all to finish."""
-        self.define_connections()
-        for node in self.nodes:
-            node.start()
+        await self.define_connections()
+        await asyncio.gather(*(node.run() for node in self.nodes))
 
         for node in self.nodes:
-            node.join()
+            await node.client.close()
+        await self.server.close()
@@ -1,14 +1,25 @@
-import json
+import msgpack
+import struct
+
+
+# Big-endian length prefix that precedes every serialized Message on the wire.
+FRAME_HEADER = struct.Struct(">I")
+
+# Fixed layout of the Messages without data: msg_type, src, ts and dest. Its first byte, the
+# msg_type, is always below 0x80, while the MessagePack arrays used otherwise start at 0x90.
+PLAIN_MESSAGE = struct.Struct(">BHIH")
 
 
 class MessageType:
-    """Message types necessary."""
-    REQUEST = "REQUEST"
-    GRANT = "GRANT"
-    RELEASE = "RELEASE"
-    FAILED = "FAILED"
-    INQUIRE = "INQUIRE"
-    YIELD = "YIELD"
+    """Message types necessary, encoded as small integers to keep the payloads short."""
+    REQUEST = 0
+    GRANT = 1
+    RELEASE = 2
+    FAILED = 3
+    INQUIRE = 4
+    YIELD = 5
+
+    NAMES = ("REQUEST", "GRANT", "RELEASE", "FAILED", "INQUIRE", "YIELD")
 
 
 class Message(object):
@@ -16,13 +27,15 @@ class Message(object):
     Message sent between nodes.
 
     Attributes:
-        msg_type (Message_Type): Type of the message.
+        msg_type (int): Type of the message, one of MessageType.
         src (int): ID of the message sender.
         dest (int): ID of the message receiver.
         ts (int): Lamport timestamp of the message sending.
         data (any, optional): Content of the message.
     """
 
+    __slots__ = ('msg_type', 'src', 'dest', 'ts', 'data')
+
     def __init__(self,
                  msg_type=None,
                  src=None,
@@ -35,88 +48,36 @@ class Message(object):
         self.ts = ts
         self.data = data
 
-    def set_type(self, msg_type):
-        self.msg_type = msg_type
-
-    def set_src(self, src):
-        self.src = src
-
-    def set_dest(self, dest):
-        self.dest = dest
-
-    def set_ts(self, ts):
-        self.ts = ts
-
-    def set_data(self, data):
-        self.data = data
-
-
-    def __json__(self):
-        """Puts the Message in a JSON format."""
-        return dict(msg_type=self.msg_type,
-                    src=self.src,
-                    dest=self.dest,
-                    ts=self.ts,
-                    data=self.data)
 
+    def to_bytes(self):
+        """
+        Serializes the Message into bytes. Messages without data, the most common ones, are packed
+        with the fixed PLAIN_MESSAGE layout. The rest are serialized as a MessagePack array of their
+        fields, with dest last.
+        """
+        if self.data is None:
+            return PLAIN_MESSAGE.pack(self.msg_type, self.src, self.ts, self.dest)
 
-    def to_json(self):
-        """Serializes the JSON representation of the Message."""
-        obj_dict = dict()
-        obj_dict['msg_type'] = self.msg_type
-        obj_dict['src'] = self.src
-        obj_dict['dest'] = self.dest
-        obj_dict['ts'] = self.ts
-        obj_dict['data'] = self.data
-        return json.dumps(obj_dict)
+        return msgpack.packb((self.msg_type, self.src, self.ts, self.data, self.dest))
 
 
     @staticmethod
-    def from_json(msg):
+    def from_bytes(stream):
         """
-        Converts a JSON back into a Message.
+        Converts the bytes of a serialized Message back into a Message.
 
         Args:
-            msg (dict): JSONified Message.
+            stream (bytes): Serialized Message.
         """
+        if stream[0] < 0x80:
+            msg_type, src, ts, dest = PLAIN_MESSAGE.unpack(stream)
+            data = None
+        else:
+            msg_type, src, ts, data, dest = msgpack.unpackb(stream, use_list=False)
         return Message(
-            msg_type=msg['msg_type'],
-            src=msg['src'],
-            dest=msg['dest'],
-            ts=msg['ts'],
-            data=msg['data']
+            msg_type=msg_type,
+            src=src,
+            dest=dest,
+            ts=ts,
+            data=data
         )
-
-
-    @staticmethod
-    def parse(str):
-        """
-        Parses a serialized JSONified Message to identify possible joined
-        back-to-back JSONs. In case of finding any, it splits them in single
-        serialized JSONs.
-
-        Args:
-            str (str): Serialized stream with one or more JSONs.
-
-        Raises:
-            ValueError: If some JSON does not end in '}'.
-
-        Returns:
-            list: All the serialized JSONs separated.
-        """
-        msgs = []
-
-        while True:
-            split = str.find("}{")
-            if split == -1:
-                if str[-1] != '}':
-                    raise ValueError("JSON must end in }")
-                msgs.append(str)
-                break
-            
-            if str[:split + 1][-1] != '}':
-                raise ValueError("JSON must end in }")
-            msgs.append(str[:split + 1])
-            str = str[split + 1:]
-
-        return msgs
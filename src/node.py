@@ -1,61 +1,62 @@
 from math import ceil, sqrt
 from message import Message, MessageType
-from nodeServer import NodeServer
 from nodeSend import NodeSend
-from queue import PriorityQueue
-from threading import Thread, Condition
+import asyncio
 import config
+import heapq
 import random
-import time
 
 
-class Node(Thread):
+class Node(object):
     """
-    Represents a Node of the distributed system.
+    Represents a Node of the distributed system. All nodes run as tasks of the same asyncio event loop,
+    and the handlers never await, so each one runs to completion without interleaving with the others.
 
     Attributes:
         id (int): Node's identifier.
         port (int): Node's port.
-        daemon (bool): Thread's daemon option.
         lamport_ts (int): Lamport timestamp of the last message sent.
-        server (NodeServer): Server for handling the incoming messages.
+        server (NodeServer): Server shared by all nodes for handling the incoming messages.
         client (NodeSend): Client for handling message sending.
         colleagues (list): List of colleagues in the Node's quorum.
-        condition (Condition): Condition upon which entering the CS is allowed
-        queue (PriorityQueue): Stores other nodes' requests based on priority.
+        quorum_size (int): Number of colleagues in the Node's quorum.
+        quorum_event (asyncio.Event): Set once the grants from a full quorum have been received.
+        queue (list): Heap storing other nodes' requests based on priority.
         grants_sent (tuple): Highest priority node to which a GRANT is sent.
-        grants_received (set): IDs of the nodes that have conceded a GRANT.
+        grants_received (int): Bitmask of the IDs of the nodes that have conceded a GRANT.
         yielded (bool): True if the node has already yielded; False otherwise.
         failed (bool): True if the node has received a FAILED; False otherwise.
         in_CS (bool): True if the node is in the critical section; False otherwise.
     """
 
     _FINISHED_NODES = 0
-    _HAVE_ALL_FINISHED = Condition()
+    _HAVE_ALL_FINISHED = asyncio.Event()
 
-    def __init__(self, id):
+    def __init__(self, id, server):
         """Constructor for class Node."""
-        Thread.__init__(self)
         self.id = id
         self.port = config.port+id
-        self.daemon = True
         self.lamport_ts = 0
         self.__form_colleagues()
-        self.server = NodeServer(self)
-        self.server.start()
+        self.server = server
         self.client = NodeSend(self)
-        self.condition = Condition()
-        self.queue = PriorityQueue()
+        self.quorum_event = asyncio.Event()
+        self.queue = []
         self.grants_sent = None
-        self.grants_received = set()
+        self.grants_received = 0
         self.yielded = False
         self.failed = False
         self.in_CS = False
 
 
-    def do_connections(self):
+    async def listen(self):
+        """Starts receiving the messages sent to this node."""
+        await self.server.register(self)
+
+
+    async def do_connections(self):
         """Connects to all nodes via socket."""
-        self.client.build_connection()
+        await self.client.build_connection()
 
 
     def __form_colleagues(self):
@@ -81,26 +82,29 @@ class Node(Thread):
                 continue
             colleagues.add(pos)
 
-        while len(colleagues) < (2 * num_rows - 1):
-            colleagues.add(random.randint(0, config.numNodes-1))
+        # Pad the quorum with random nodes, as far as there are any left to pick
+        needed = 2 * num_rows - 1 - len(colleagues)
+        if needed > 0:
+            pool = [i for i in range(config.numNodes) if i not in colleagues]
+            colleagues.update(random.sample(pool, min(needed, len(pool))))
 
         colleagues.discard(self.id)
         self.colleagues = list(colleagues)
+        self.quorum_size = len(self.colleagues)
 
 
-    def run(self):
-        """Main thread loop that performs Maekawa mutual-exclusion actions."""
+    async def run(self):
+        """Main task loop that performs Maekawa mutual-exclusion actions."""
         print(f"Run Node{self.id} with the follows {self.colleagues}")
-        self.client.start()
 
         self.wakeupcounter = 0
         while self.wakeupcounter <= 2: # Termination criteria
             # Nodes with different starting times
             time_offset = random.uniform(2, 8)
-            time.sleep(time_offset)
+            await asyncio.sleep(time_offset)
 
             # Send requests to all quorum peers
-            self.grants_received.add(self.id)
+            self.grants_received |= 1 << self.id
 
             req = Message(
                 msg_type=MessageType.REQUEST,
@@ -108,24 +112,23 @@ class Node(Thread):
                 ts=self.lamport_ts,
             )
             self.client.multicast(req, self.colleagues)
-            print(f"Node_{self.id} sent {req.msg_type} to {self.colleagues}")
+            print(f"Node_{self.id} sent {MessageType.NAMES[req.msg_type]} to {self.colleagues}")
 
-            # Wait for a unanimous grant
-            with self.condition:
-                while len(self.grants_received) < len(self.colleagues):
-                    self.condition.wait()
+            # Wait for a unanimous grant, checking it was not yielded since the event was set
+            while self.grants_received.bit_count() < self.quorum_size:
+                await self.quorum_event.wait()
+                self.quorum_event.clear()
 
-                self.in_CS = True
+            self.in_CS = True
 
             # ENTER CRITICAL SECTION
             print(f"[Node_{self.id}]: Greetings from the critical section!")
             time_offset = random.uniform(0.5, 1.5)
-            time.sleep(time_offset)
+            await asyncio.sleep(time_offset)
             # EXIT CRITICAL SECTION
 
-            with self.condition:
-                self.grants_received.clear()
-                self.in_CS = False
+            self.grants_received = 0
+            self.in_CS = False
 
             # Send release messages to all quorum peers
             rel = Message(
@@ -134,31 +137,29 @@ class Node(Thread):
                 ts=self.lamport_ts,
             )
             self.client.multicast(rel, self.colleagues)
-            print(f"Node_{self.id} sent {req.msg_type} to {self.colleagues}")
+            print(f"Node_{self.id} sent {MessageType.NAMES[req.msg_type]} to {self.colleagues}")
 
             # Control iteration
             self.wakeupcounter += 1
 
         # Wait for all nodes to finish
         print(f"Node_{self.id} is waiting for all nodes to finish")
-        self._finished()
+        await self._finished()
 
         print(f"Node_{self.id} DONE!")
 
 
     @staticmethod
-    def _finished():
+    async def _finished():
         """
-        Increments the counter of finished nodes and blocks until all nodes have called this method.
-        Notifies all waiting threads once the last node reaches the barrier.
+        Increments the counter of finished nodes and waits until all nodes have called this method.
+        Wakes up all waiting tasks once the last node reaches the barrier.
         """
-        with Node._HAVE_ALL_FINISHED:
-            Node._FINISHED_NODES += 1
-            if Node._FINISHED_NODES == config.numNodes:
-                Node._HAVE_ALL_FINISHED.notify_all()
+        Node._FINISHED_NODES += 1
+        if Node._FINISHED_NODES == config.numNodes:
+            Node._HAVE_ALL_FINISHED.set()
 
-            while Node._FINISHED_NODES < config.numNodes:
-                Node._HAVE_ALL_FINISHED.wait()
+        await Node._HAVE_ALL_FINISHED.wait()
 
 
     def request_handler(self, msg: Message):
@@ -171,21 +172,22 @@ class Node(Thread):
             - If this node has granted to a lower-priority request, enqueue the incoming request and send INQUIRE
                 to the node that currently holds the GRANT so it can decide whether to yield.
         """
+        src = msg.src
+        request = (msg.ts, src)
+
         # Get the highest priority node that has received a GRANT from this
         if self.grants_sent:
             hp_ts, hp_src = self.grants_sent
 
-            if (hp_ts, hp_src) < (msg.ts, msg.src):
+            if (hp_ts, hp_src) < request:
                 rep = Message(
                     MessageType.FAILED,
                     self.id,
-                    msg.src,
+                    src,
                     self.lamport_ts,
                 )
-                self.client.send_message(rep, msg.src)
-                self.queue.put((msg.ts, msg.src))
-
-                print(f"Node_{self.id} sent msg: {rep.msg_type}")
+                self.client.send_message(rep, src)
+                heapq.heappush(self.queue, request)
 
             else:
                 rep = Message(
@@ -193,39 +195,37 @@ class Node(Thread):
                     self.id,
                     hp_src,
                     self.lamport_ts,
-                    (msg.ts, msg.src),
+                    request,
                 )
                 self.client.send_message(rep, hp_src)
-                self.queue.put((msg.ts, msg.src))
-
-                print(f"Node_{self.id} sent msg: {rep.msg_type}")
+                heapq.heappush(self.queue, request)
 
         # Reply with a GRANT if no other GRANTs have been sent.
         else:
             rep = Message(
                 MessageType.GRANT,
                 self.id,
-                msg.src,
+                src,
                 self.lamport_ts,
             )
-            self.client.send_message(rep, msg.src)
-            self.grants_sent = (msg.ts, msg.src)
-
-            print(f"Node_{self.id} sent msg: {rep.msg_type}")
+            self.client.send_message(rep, src)
+            self.grants_sent = request
 
 
     def yield_handler(self, msg: Message):
         """Enqueues the yielding request and grant the next one."""
+        request = (msg.ts, msg.src)
+
         # Put the yielding node in the queue
-        self.queue.put((msg.ts, msg.src))
+        heapq.heappush(self.queue, request)
 
         # Clear the grant sent to the yielding node
-        if self.grants_sent and (msg.ts, msg.src) == self.grants_sent:
+        if self.grants_sent and request == self.grants_sent:
             self.grants_sent = None
 
         # Get the info of the highest priority request in the queue
-        if not self.queue.empty():
-            q_ts, q_src = self.queue.get()
+        if self.queue:
+            q_ts, q_src = heapq.heappop(self.queue)
 
             rep = Message(
                 MessageType.GRANT,
@@ -236,29 +236,25 @@ class Node(Thread):
             self.client.send_message(rep, q_src)
             self.grants_sent = (q_ts, q_src)
 
-            print(f"Node_{self.id} sent msg: {rep.msg_type}")
-
 
     def release_handler(self, msg: Message):
         """
         Removes the releasing node from any local queue or grants state and,
         if there are waiting requests, grants the highest-priority one.
         """
+        src = msg.src
+
         # Remove the releasing node from the queue and grants_sent
-        if self.grants_sent and (msg.ts, msg.src) == self.grants_sent:
+        if self.grants_sent and (msg.ts, src) == self.grants_sent:
             self.grants_sent = None
 
-        new_queue = PriorityQueue()
-        while not self.queue.empty():
-            q_ts, q_src = self.queue.get()
-            if q_src == msg.src:
-                continue
-            new_queue.put((q_ts, q_src))
-        self.queue = new_queue
+        if any(q_src == src for _, q_src in self.queue):
+            self.queue = [(q_ts, q_src) for q_ts, q_src in self.queue if q_src != src]
+            heapq.heapify(self.queue)
 
         # Sent a GRANT to the request with the highest priority
-        if not self.queue.empty():
-            q_ts, q_src = self.queue.get()
+        if self.queue:
+            q_ts, q_src = heapq.heappop(self.queue)
 
             rep = Message(
                 MessageType.GRANT,
@@ -269,8 +265,6 @@ class Node(Thread):
             self.client.send_message(rep, q_src)
             self.grants_sent = (q_ts, q_src)
 
-            print(f"Node_{self.id} sent msg: {rep.msg_type}")
-
         else:
             self.grants_sent = None
 
@@ -283,43 +277,38 @@ class Node(Thread):
         rep = None
 
         # If it hasn't got the CS, yield
-        with self.condition:
-            if not self.in_CS:
-                rep = Message(
-                    MessageType.YIELD,
-                    self.id,
-                    msg.src,
-                    self.lamport_ts,
-                )
+        if not self.in_CS:
+            rep = Message(
+                MessageType.YIELD,
+                self.id,
+                msg.src,
+                self.lamport_ts,
+            )
 
-                self.yielded = True
-                if msg.src in self.grants_received:
-                    self.grants_received.remove(msg.src)
+            self.yielded = True
+            self.grants_received &= ~(1 << msg.src)
 
         # Send a yield message if created
         if rep:
             self.client.send_message(rep, msg.src)
-            print(f"Node_{self.id} sent msg: {rep.msg_type}")
 
 
     def grant_handler(self, msg: Message):
         """
-        Adds the granting node to the received's list, resets the flags, and notifies the local condition variable
+        Adds the granting node to the received's list, resets the flags, and sets the quorum event
         if the node has collected grants from a full quorum.
         """
-        with self.condition:
-            self.grants_received.add(msg.src)
-            self.yielded = False
-            self.failed = False
+        self.grants_received |= 1 << msg.src
+        self.yielded = False
+        self.failed = False
 
-            if not len(self.grants_received) < len(self.colleagues):
-                self.condition.notify()
+        if self.grants_received.bit_count() >= self.quorum_size:
+            self.quorum_event.set()
 
 
     def failed_handler(self):
         """
         Marks the local state to indicate the current request was denied by at least one peer.
         """
-        with self.condition:
-            self.failed = True
-            self.yielded = True
+        self.failed = True
+        self.yielded = True
@@ -1,27 +1,52 @@
-from copy import deepcopy
-from threading import Thread
+from contextlib import contextmanager
+from message import FRAME_HEADER
+import asyncio
 import config
 import utils
 
 
-class NodeSend(Thread):
-    """Handles a node's operations related to message sending."""
+class NodeSend(object):
+    """
+    Handles a node's operations related to message sending.
+
+    Attributes:
+        node (Node): Node that sends the messages as a client.
+        client_sockets (list): Socket connected to each Node, indexed by its id.
+        writers (list): Stream writer over the socket of each Node, indexed by its id.
+        outbox (list): Framed messages not yet sent to each Node, indexed by its id.
+        deferred (bool): True while the sends are being batched; False otherwise.
+        pending (set): IDs of the Nodes whose outbox was written while the sends were deferred.
+    """
 
     def __init__(self, node):
-        Thread.__init__(self)
         self.node = node
         self.client_sockets = [utils.create_client_socket() for _ in range(config.numNodes)]
+        self.writers = [None] * config.numNodes
+        self.outbox = [bytearray() for _ in range(config.numNodes)]
+        self.deferred = False
+        self.pending = set()
 
 
-    def build_connection(self):
+    async def build_connection(self):
         """Connects each node client socket to the host and port."""
+        loop = asyncio.get_running_loop()
         for i in range(config.numNodes):
-            self.client_sockets[i].connect(('localhost',config.port+i))
+            await loop.sock_connect(self.client_sockets[i], ('localhost',config.port+i))
+            _, self.writers[i] = await asyncio.open_connection(sock=self.client_sockets[i])
+
+
+    async def close(self):
+        """Closes the connections to all nodes once the messages still pending in them are sent."""
+        for writer in self.writers:
+            writer.close()
+        for writer in self.writers:
+            await writer.wait_closed()
 
 
     def send_message(self, msg, dest, multicast=False):
         """
-        Sends a message to one destination.
+        Sends a message to one destination. The message is written to the destination's outbox,
+        which is flushed right away unless it is part of a multicast or the sends are deferred.
 
         Args:
             msg (Message): Message to be sent.
@@ -30,24 +55,62 @@ class NodeSend(Thread):
         """
         if not multicast:
             self.node.lamport_ts += 1
-            msg.set_ts(self.node.lamport_ts)
-        assert dest == msg.dest
-        self.client_sockets[dest].sendall(bytes(msg.to_json(),encoding='utf-8'))
+            msg.ts = self.node.lamport_ts
+        payload = msg.to_bytes()
+        self.outbox[dest] += FRAME_HEADER.pack(len(payload))
+        self.outbox[dest] += payload
+        if multicast:
+            return
+        if self.deferred:
+            self.pending.add(dest)
+        else:
+            self.flush(dest)
+
+
+    def flush(self, dest):
+        """
+        Sends every message pending in a destination's outbox with a single write. The messages are
+        small, so the write is left to the transport's buffering instead of awaiting its drain.
+
+        Args:
+            dest (int): Destination Node id.
+        """
+        if self.outbox[dest]:
+            # The transport may keep a reference to the data, so hand it over instead of clearing it
+            self.writers[dest].write(self.outbox[dest])
+            self.outbox[dest] = bytearray()
+
+
+    @contextmanager
+    def batch(self):
+        """
+        Defers the sends made inside the block, so all the messages to the same destination are
+        sent together once it exits. Meant for the NodeServer while it handles a batch of received
+        messages.
+        """
+        self.deferred = True
+        try:
+            yield
+        finally:
+            self.deferred = False
+            for dest in self.pending:
+                self.flush(dest)
+            self.pending.clear()
 
 
     def multicast(self, msg, group):
         """
-        Sends a message to all the Nodes of a set group.
+        Sends a message to all the Nodes of a set group. The same Message is reused for every
+        destination, so its dest is left set to the last Node of the group.
 
         Args:
             msg (Message): Message to be sent.
             group (list): IDs of the nodes in the group.
         """
         self.node.lamport_ts += 1
-        msg.set_ts(self.node.lamport_ts)
+        msg.ts = self.node.lamport_ts
+        for dest in group:
+            msg.dest = dest
+            self.send_message(msg, dest, True)
         for dest in group:
-            new_msg = deepcopy(msg)
-            new_msg.set_dest(dest)
-            assert new_msg.dest == dest
-            assert new_msg.ts == msg.ts
-            self.send_message(new_msg, dest, True)
+            self.flush(dest)
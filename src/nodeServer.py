@@ -1,92 +1,128 @@
-from message import Message, MessageType
-from threading import Thread
-import json
-import select
+from message import FRAME_HEADER, Message, MessageType
+import asyncio
 import utils
 
 
-class NodeServer(Thread):
+# Bytes read from a connection per read call.
+RECV_SIZE = 65536
+
+
+class NodeServer(object):
     """
-    Handles the messages received by the nodes to responde them.
+    Handles the messages received by all the nodes to responde them, serving every node's
+    server socket from the running event loop.
 
     Attributes:
-        node (Node): Node that receives the messages as a server.
-        daemon (bool): Thread's daemon option.
-        connection_list(list): Stores all connections to this node as a server.
-        server_socket(socket.socket): Socket as server.
+        servers(list): asyncio server accepting the connections of each registered node.
+        handlers(dict): For each registered node id, the Node handler for each type of message.
     """
 
-    def __init__(self, node):
-        Thread.__init__(self)
-        self.node = node
-        self.daemon = True
+    def __init__(self):
+        self.servers = []
+        self.handlers = {}
+
 
+    async def register(self, node):
+        """
+        Opens the server socket of a node and starts serving the connections made to it.
+
+        Args:
+            node (Node): Node that receives the messages as a server.
+        """
+        self.handlers[node.id] = {
+            MessageType.REQUEST: node.request_handler,
+            MessageType.YIELD: node.yield_handler,
+            MessageType.RELEASE: node.release_handler,
+            MessageType.INQUIRE: node.inquire_handler,
+            MessageType.GRANT: node.grant_handler,
+            MessageType.FAILED: lambda msg: node.failed_handler(),
+        }
+        server = await asyncio.start_server(
+            lambda reader, writer: self.update(node, reader, writer),
+            sock=utils.create_server_socket(node.port),
+        )
+        self.servers.append(server)
 
-    def run(self):
-        """Starts the objects of this class as Threads."""
-        self.update()
 
+    async def close(self):
+        """Stops serving the connections of all the registered nodes and waits for them to end."""
+        for server in self.servers:
+            server.close()
+        for server in self.servers:
+            await server.wait_closed()
 
-    def update(self):
+
+    async def update(self, node, reader, writer):
         """
-        Handles the receiving of messages. Parses the stream of bytes to detect the different JSONs,
-        converting them back into Messages to be processed.
+        Handles the receiving of messages through one connection. Splits its stream of bytes into
+        length-prefixed frames, converting them back into Messages to be processed by the Node
+        the connection was accepted for.
+
+        Args:
+            node (Node): Node that receives the messages.
+            reader (asyncio.StreamReader): Reader of the connection.
+            writer (asyncio.StreamWriter): Writer of the connection, only used to close it.
         """
-        self.connection_list = []
-        self.server_socket = utils.create_server_socket(self.node.port)
-        self.connection_list.append(self.server_socket)
-
-        while self.node.daemon:
-            (read_sockets, write_sockets, error_sockets) = select.select(
-                self.connection_list, [], [], 20)
-            if not (read_sockets or write_sockets or error_sockets):
-                print(f'Node_{self.node.id} - Timed out') #force to assert the while condition
-            else:
-                for read_socket in read_sockets:
-                    if read_socket == self.server_socket:
-                        (conn, addr) = read_socket.accept()
-                        self.connection_list.append(conn)
-                    else:
-                        try:
-                            msg_stream, _ = read_socket.recvfrom(4096)
-                            try:
-                                msgs = Message.parse(str(msg_stream, "utf-8"))
-                                for m in msgs:
-                                    self.process_message(Message.from_json(json.loads(m)))
-                            except Exception as e:
-                                print("Exception: ", end="")
-                                print(e)
-                        except:
-                            read_socket.close()
-                            self.connection_list.remove(read_socket)
-                            continue
-
-        self.server_socket.close()
-
-
-    def process_message(self, msg: Message):
+        buffer = bytearray()
+        while True:
+            try:
+                msg_stream = await reader.read(RECV_SIZE)
+            except ConnectionError:
+                break
+            if not msg_stream:
+                break
+
+            try:
+                with node.client.batch():
+                    for frame in self.read_frames(buffer, msg_stream):
+                        self.process_message(node, Message.from_bytes(frame))
+            except Exception as e:
+                print("Exception: ", end="")
+                print(e)
+
+        writer.close()
+
+
+    def read_frames(self, buffer, msg_stream):
+        """
+        Appends the received bytes to the connection's buffer and extracts every complete frame,
+        leaving any incomplete one buffered until the rest of it arrives.
+
+        Args:
+            buffer (bytearray): Bytes received from the connection not yet forming a complete frame.
+            msg_stream (bytes): Bytes received.
+
+        Returns:
+            list: Payloads of the complete frames, without their length prefix.
+        """
+        buffer += msg_stream
+
+        frames = []
+        offset = 0
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+            start = offset + FRAME_HEADER.size
+            end = start + length
+            if len(buffer) < end:
+                break
+            frames.append(bytes(buffer[start:end]))
+            offset = end
+
+        del buffer[:offset]
+        return frames
+
+
+    def process_message(self, node, msg: Message):
         """
-        Handles the type of message received.
+        Handles the type of message received by a node.
 
         Raises:
             ValueError: If the type of the Message is not valid.
         """
         msg_type = msg.msg_type
-        print(f"\tNode_{self.node.id} received {msg_type} from Node_{msg.src}")
-
-        self.node.lamport_ts = max(self.node.lamport_ts, msg.ts) + 1
-        match msg_type:
-            case MessageType.REQUEST:
-                self.node.request_handler(msg)
-            case MessageType.YIELD:
-                self.node.yield_handler(msg)
-            case MessageType.RELEASE:
-                self.node.release_handler(msg)
-            case MessageType.INQUIRE:
-                self.node.inquire_handler(msg)
-            case MessageType.GRANT:
-                self.node.grant_handler(msg)
-            case MessageType.FAILED:
-                self.node.failed_handler()
-            case _:
-                raise ValueError(f"[ValueError]: Unknown message type: {msg_type}")
+        handler = self.handlers[node.id].get(msg_type)
+        if handler is None:
+            raise ValueError(f"[ValueError]: Unknown message type: {msg_type}")
+
+        node.lamport_ts = max(node.lamport_ts, msg.ts) + 1
+        handler(msg)
@@ -1,6 +1,10 @@
 import socket
 
 
+# Kernel buffer size of the sockets, large enough to absorb a burst of multicasts.
+SOCKET_BUFFER_SIZE = 262144
+
+
 def create_server_socket(port):
     """
     Creates a socket for a server.
@@ -13,6 +17,7 @@ def create_server_socket(port):
     """
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE) # inherited by accepted connections
     s.bind(("127.0.0.1", port))
     s.listen()
     return s
@@ -26,5 +31,7 @@ def create_client_socket():
         socket.socket: socket on the client side.
     """
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(1000) #non-blocking mode
+    s.setblocking(False) #non-blocking mode
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # messages are small, don't wait to coalesce them
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
     return s